@@ -1,14 +1,23 @@
 import asyncio
+import codecs
 import datetime
+import functools
+import random
+import re
+import sys
 from collections import defaultdict
-from typing import Any, Literal
+from collections.abc import Awaitable, Callable
+from types import MappingProxyType
+from typing import Any, Literal, TypeVar
 
 import aiohttp
+import orjson
+from aiohttp_client_cache import CachedSession, SQLiteBackend
 from asyncache import cached
-from bs4 import BeautifulSoup
-from bs4.element import Tag
 from cachetools import TTLCache
 from fake_useragent import UserAgent
+from lxml import etree, html
+from pydantic import TypeAdapter
 
 from .endpoints import (
     FUBON_MAIN_FORCE,
@@ -30,15 +39,125 @@ from .utils import roc_to_western_date
 
 __all__ = ("StockCrawl",)
 
-ua = UserAgent()
+# _gather_by_id 中 fetch 的回傳型別
+_T = TypeVar("_T")
+
+# 含千分位逗號的整數欄位, 前後可有空白
+_NUMBER_RE = re.compile(r"\s*\d[\d,]*\s*")
+# 預先編譯的 XPath, 避免每次解析時重新編譯
+# 主力進出明細: 每列為買超與賣超卷商各 5 欄
+_MAIN_FORCE_ROWS = etree.XPath("//tr[count(td)=10]")
+# 主力進出明細表: 每列 5 欄
+_BUY_SELL_ROWS = etree.XPath("//tr[count(td)=5]")
+# 重大訊息: 目標表格中標題列之後, 剛好有 6 欄的列
+_NEWS_ROWS = etree.XPath(
+    '(//table[@class="hasBorder" and @align="center" and @border="1"])[1]'
+    "/descendant::tr[position()>1][count(td)=6]"
+)
+# 類股首頁: 第一個表格第一列中的類股連結
+_CATEGORY_LINK_CELLS = etree.XPath('(//table)[1]/descendant::tr[1]//td[@width="25%"]')
+# 類股頁面: 第二個表格中有 10 欄的列的第一欄, 開頭為股票代號
+_CATEGORY_STOCK_CELLS = etree.XPath("(//table)[2]//tr[count(td)=10]/td[1]")
+# 富邦連線失敗時的最大重試次數, 第 n 次重試前等待 5n 秒
+_MAIN_FORCE_MAX_RETRIES = 6
+# 一次驗證整個列表, 避免逐筆呼叫模型建構子
+_STOCK_LIST = TypeAdapter(list[Stock])
+_HISTORY_TRADE_LIST = TypeAdapter(list[HistoryTrade])
+# 盤中可能更新的端點在 HTTP 快取中只保存 5 分鐘, 其餘端點使用預設的 12 小時
+_HTTP_CACHE_URLS_EXPIRE_AFTER = {
+    TWSE_PUNISH: datetime.timedelta(minutes=5),
+    TPEX_PUNISH: datetime.timedelta(minutes=5),
+    MOPS_NEWS: datetime.timedelta(minutes=5),
+}
+# 每個請求都相同的標頭, 設定在 session 上
+_SESSION_HEADERS = {"Accept-Encoding": "gzip, deflate, br"}
+# 預先產生的隨機請求標頭數量
+_HEADER_POOL_SIZE = 64
+
+
+@functools.cache
+def _header_pool() -> tuple[MappingProxyType[str, str], ...]:
+    """
+    產生所有 StockCrawl 共用的隨機請求標頭
+
+    第一次呼叫時才載入 UserAgent, 避免在 import 時就讀取 User-Agent 資料庫;
+    標頭在請求之間共用, 以唯讀的 MappingProxyType 避免被修改
+    """
+    ua = UserAgent()
+    return tuple(
+        MappingProxyType({"User-Agent": ua.random}) for _ in range(_HEADER_POOL_SIZE)
+    )
+
+
+@functools.cache
+def _html_parser(encoding: str | None) -> html.HTMLParser:
+    """取得指定編碼的 HTML 解析器, 編碼無法使用時由 lxml 依 <meta charset> 判斷"""
+    if encoding is not None:
+        try:
+            # 以 Python 的正式名稱傳給 lxml, 例如 ms950 -> cp950
+            return html.HTMLParser(encoding=codecs.lookup(encoding).name)
+        except LookupError:
+            pass
+    return html.HTMLParser()
+
+
+def _first_href(element: html.HtmlElement) -> str:
+    """取得元素內第一個 <a> 標籤的連結, 沒有連結時回傳空字串"""
+    a = element.find(".//a")
+    return "" if a is None else a.get("href", "")
+
+
+async def _gather_by_id(
+    ids: list[str], fetch: Callable[[str], Awaitable[_T]], concurrency: int
+) -> dict[str, _T]:
+    """對每個代號呼叫 fetch, 同時進行的請求不超過 concurrency 個"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded_fetch(id: str) -> tuple[str, _T]:
+        async with semaphore:
+            return id, await fetch(id)
+
+    return dict(await asyncio.gather(*(bounded_fetch(id) for id in ids)))
 
 
 class StockCrawl:
-    def __init__(self, *, proxy: str | None = None) -> None:
-        self.session = aiohttp.ClientSession(
-            connector=aiohttp.TCPConnector(ssl=False), trust_env=True
+    def __init__(
+        self, *, proxy: str | None = None, http_cache_path: str | None = None
+    ) -> None:
+        """
+        參數:
+            proxy: HTTP 代理伺服器網址
+            http_cache_path: HTTP 回應快取的 SQLite 檔案路徑, 設定後 GET 請求的回應會
+                保存在磁碟上 12 小時 (處置股與重大訊息為 5 分鐘), 重新執行程式時不需
+                再次連線; 預設為 None (不快取)
+        """
+        connector = aiohttp.TCPConnector(
+            ssl=False,
+            limit=100,
+            limit_per_host=10,
+            ttl_dns_cache=300,
+            keepalive_timeout=30,
+            # CPython 3.12.7 之後已修正 SSL 連線未關閉的問題, aiohttp 不再需要這個選項
+            enable_cleanup_closed=sys.version_info < (3, 12, 7),
         )
+        if http_cache_path is None:
+            self.session = aiohttp.ClientSession(
+                connector=connector, headers=_SESSION_HEADERS, trust_env=True
+            )
+        else:
+            self.session = CachedSession(
+                cache=SQLiteBackend(
+                    cache_name=http_cache_path,
+                    expire_after=datetime.timedelta(hours=12),
+                    urls_expire_after=_HTTP_CACHE_URLS_EXPIRE_AFTER,
+                    allowed_methods=("GET",),
+                ),
+                connector=connector,
+                headers=_SESSION_HEADERS,
+                trust_env=True,
+            )
         self.proxy = proxy
+        self._header_pool = _header_pool()
 
     async def __aenter__(self) -> "StockCrawl":
         return self
@@ -50,16 +169,24 @@ class StockCrawl:
         self,
         url: str,
         params: dict[str, Any] | None = None,
-        return_type: Literal["json", "text"] = "json",
+        return_type: Literal["json", "html"] = "json",
     ) -> Any:
         async with self.session.get(
-            url, params=params, headers={"User-Agent": ua.random}, proxy=self.proxy
+            url,
+            params=params,
+            headers=random.choice(self._header_pool),
+            proxy=self.proxy,
         ) as resp:
             if resp.status != 200:
                 return None
+            body = await resp.read()
+            # 空白的內容無法解析, 與非 200 回應一樣回傳 None (同 aiohttp 的 resp.json)
+            if not body.strip():
+                return None
             if return_type == "json":
-                return await resp.json()
-            return await resp.text(errors="replace")
+                return orjson.loads(body)
+            # 直接將原始位元組交給 lxml 解碼, 不先轉換成 str
+            return html.fromstring(body, parser=_html_parser(resp.charset))
 
     async def close(self) -> None:
         """
@@ -78,19 +205,41 @@ class StockCrawl:
             list[Stock]: 上市上櫃公司的物件
         """
         data = await self._request(STOCK_API_STOCKS)
-        return [Stock(**d) for d in data]
+        return _STOCK_LIST.validate_python(data)
+
+    @cached(TTLCache(ttl=60 * 60 * 24, maxsize=1))
+    async def _fetch_stock_lookups(
+        self,
+    ) -> tuple[dict[str, Stock], dict[str, Stock]]:
+        """取得以股票代號與股票名稱為 key 的上市上櫃公司對應表"""
+        data = await self._request(STOCK_API_STOCKS)
+        # 無法取得列表時回傳空的對應表, fetch_stock 會改為逐筆向 Stock API 查詢
+        if data is None:
+            return {}, {}
+        stocks = _STOCK_LIST.validate_python(data)
+        return (
+            {stock.id: stock for stock in stocks},
+            {stock.name: stock for stock in stocks},
+        )
 
     @cached(TTLCache(ttl=60 * 60 * 24, maxsize=100))
     async def fetch_stock(self, stock_id_or_name: str) -> Stock | None:
         """
         從 Stock API 取得單個上市上櫃公司的股票代號與名稱
 
+        會先從已快取的上市上櫃公司列表中查詢, 找不到時才向 Stock API 查詢
+
         參數:
             stock_id_or_name: 上市上櫃公司代號或名稱
 
         回傳:
             Stock | None: 上市上櫃公司的物件, 如果找不到則回傳 None
         """
+        stocks_by_id, stocks_by_name = await self._fetch_stock_lookups()
+        lookup = stocks_by_id if stock_id_or_name.isdigit() else stocks_by_name
+        if (stock := lookup.get(stock_id_or_name)) is not None:
+            return stock
+
         if stock_id_or_name.isdigit():
             data = await self._request(f"{STOCK_API_STOCKS}/{stock_id_or_name}")
         else:
@@ -124,7 +273,6 @@ class StockCrawl:
         date: datetime.date,
         *,
         recent_day: RecentDay = RecentDay.ONE,
-        retry: int = 0,
     ) -> list[MainForce]:
         """
         從富邦 API 取得單個上市上櫃公司的主力進出明細
@@ -140,37 +288,64 @@ class StockCrawl:
         else:
             url = FUBON_MAIN_FORCE.format(id=id, day=recent_day.value)
 
-        try:
-            data = await self._request(url, return_type="text")
-        except aiohttp.ClientConnectionError as e:
-            if retry > 5:
-                raise e
-
-            await asyncio.sleep(5 * (retry + 1))
-            return await self.fetch_main_forces(
-                id, date, recent_day=recent_day, retry=retry + 1
-            )
+        for retry in range(_MAIN_FORCE_MAX_RETRIES + 1):
+            try:
+                tree = await self._request(url, return_type="html")
+                break
+            except aiohttp.ClientConnectionError:
+                if retry == _MAIN_FORCE_MAX_RETRIES:
+                    raise
+                await asyncio.sleep(5 * (retry + 1))
 
-        soup = BeautifulSoup(data, "lxml")
-        rows = soup.find_all("tr")
         main_forces: list[MainForce] = []
+        if tree is None:
+            return main_forces
+
+        for row in _MAIN_FORCE_ROWS(tree):
+            tds = row.findall("td")
+            # 每個 <td> 只取一次文字, 之後的檢查與解析都使用這份文字
+            cells = [td.text_content() for td in tds]
+            # 檢查第二個 <td> 是否為數字，如果不是數字，則跳過
+            if not _NUMBER_RE.fullmatch(cells[1]):
+                continue
 
-        for row in rows:
-            cells = row.find_all("td")
-            if len(cells) == 10:
-                # 檢查第二個 <td> 是否為數字，如果不是數字，則跳過
-                if not cells[1].text.strip().replace(",", "").isdigit():
-                    continue
-
-                cells_1 = cells[:5]
-                main_forces.append(MainForce.parse(cells_1, is_buy_force=True))
-                cells_2 = cells[5:]
-                if not cells_2[1].text.strip().replace(",", "").isdigit():
-                    continue
-                main_forces.append(MainForce.parse(cells_2, is_buy_force=False))
+            main_forces.append(
+                MainForce.parse(cells[:5], _first_href(tds[0]), is_buy_force=True)
+            )
+            if not _NUMBER_RE.fullmatch(cells[6]):
+                continue
+            main_forces.append(
+                MainForce.parse(cells[5:], _first_href(tds[5]), is_buy_force=False)
+            )
 
         return main_forces
 
+    async def fetch_main_forces_many(
+        self,
+        ids: list[str],
+        date: datetime.date,
+        *,
+        recent_day: RecentDay = RecentDay.ONE,
+        concurrency: int = 10,
+    ) -> dict[str, list[MainForce]]:
+        """
+        從富邦 API 同時取得多個上市上櫃公司的主力進出明細
+
+        參數:
+            ids: 上市上櫃公司代號
+            date: 日期
+            recent_day: 統計天數, 預設為近一日
+            concurrency: 同時進行的請求數量上限, 預設為 10
+
+        回傳:
+            dict[str, list[MainForce]]: 公司代號與主力進出明細對應表
+        """
+        return await _gather_by_id(
+            ids,
+            lambda id: self.fetch_main_forces(id, date, recent_day=recent_day),
+            concurrency,
+        )
+
     @cached(TTLCache(ttl=60 * 60 * 24, maxsize=100))
     async def fetch_force_buy_sells(self, url: str) -> list[BuySell]:
         """
@@ -182,18 +357,17 @@ class StockCrawl:
         回傳:
             list[BuySell]: 主力進出明細表
         """
-        data = await self._request(url, return_type="text")
-        soup = BeautifulSoup(data, "lxml")
-        rows = soup.find_all("tr")
+        tree = await self._request(url, return_type="html")
         buy_sells: list[BuySell] = []
+        if tree is None:
+            return buy_sells
 
-        for row in rows:
-            cells = row.find_all("td")
-            if len(cells) == 5:
-                # 檢查第二個 <td> 是否為數字，如果不是數字，則跳過
-                if not cells[1].text.strip().replace(",", "").isdigit():
-                    continue
-                buy_sells.append(BuySell.parse(cells))
+        for row in _BUY_SELL_ROWS(tree):
+            cells = [td.text_content() for td in row.findall("td")]
+            # 檢查第二個 <td> 是否為數字，如果不是數字，則跳過
+            if not _NUMBER_RE.fullmatch(cells[1]):
+                continue
+            buy_sells.append(BuySell.parse(cells))
 
         return buy_sells
 
@@ -205,15 +379,16 @@ class StockCrawl:
         回傳:
             dict[str, int]: 公司代號與實收資本額對應表
         """
-        twse_data = await self._request(TWSE_COMPANY_INFO)
-        twse_capital = {d["公司代號"]: int(d["實收資本額"]) for d in twse_data}
-
-        tpex_data = await self._request(TPEX_COMPANY_INFO)
-        tpex_capital = {
-            d["SecuritiesCompanyCode"]: int(d["Paidin.Capital.NTDollars"])
+        twse_data, tpex_data = await asyncio.gather(
+            self._request(TWSE_COMPANY_INFO), self._request(TPEX_COMPANY_INFO)
+        )
+        # 直接寫入同一個 dict, 避免先建立兩個 dict 再合併
+        capitals = {d["公司代號"]: int(d["實收資本額"]) for d in twse_data}
+        capitals.update(
+            (d["SecuritiesCompanyCode"], int(d["Paidin.Capital.NTDollars"]))
             for d in tpex_data
-        }
-        return {**twse_capital, **tpex_capital}
+        )
+        return capitals
 
     @cached(TTLCache(ttl=60 * 60 * 24, maxsize=100))
     async def fetch_history_trades(
@@ -234,7 +409,25 @@ class StockCrawl:
             STOCK_API_HISTORY_TRADES.format(id=id),
             params={"limit": limit} if limit else None,
         )
-        return [HistoryTrade(**d) for d in data]
+        return _HISTORY_TRADE_LIST.validate_python(data)
+
+    async def fetch_history_trades_many(
+        self, ids: list[str], *, limit: int | None = None, concurrency: int = 8
+    ) -> dict[str, list[HistoryTrade]]:
+        """
+        從 Stock API 同時取得多個上市上櫃公司的歷史交易資訊
+
+        參數:
+            ids: 上市上櫃公司代號
+            limit: 每個公司最多取得的交易資訊筆數
+            concurrency: 同時進行的請求數量上限, 預設為 8
+
+        回傳:
+            dict[str, list[HistoryTrade]]: 公司代號與歷史交易資訊對應表
+        """
+        return await _gather_by_id(
+            ids, lambda id: self.fetch_history_trades(id, limit=limit), concurrency
+        )
 
     @cached(TTLCache(ttl=60 * 60 * 24, maxsize=1))
     async def fetch_dividend_days(self) -> dict[str, datetime.date]:
@@ -244,18 +437,31 @@ class StockCrawl:
         回傳:
             dict[str, datetime.date]: 公司代號與除權息日期對應表
         """
-        twse_data = await self._request(TWSE_DIVIDEND)
-        tpex_data = await self._request(TPEX_DIVIDEND)
-        twse_dividend_days = {
-            d["Code"]: roc_to_western_date(d["Date"]) for d in twse_data
-        }
-        tpex_dividend_days = {
-            d["SecuritiesCompanyCode"]: roc_to_western_date(
-                d["ExRrightsExDividendDate"]
+        twse_data, tpex_data = await asyncio.gather(
+            self._request(TWSE_DIVIDEND), self._request(TPEX_DIVIDEND)
+        )
+        dividend_days = {d["Code"]: roc_to_western_date(d["Date"]) for d in twse_data}
+        dividend_days.update(
+            (
+                d["SecuritiesCompanyCode"],
+                roc_to_western_date(d["ExRrightsExDividendDate"]),
             )
             for d in tpex_data
-        }
-        return {**twse_dividend_days, **tpex_dividend_days}
+        )
+        return dividend_days
+
+    async def _fetch_cat_stock_ids(self, url: str) -> list[str]:
+        """取得單一類股頁面中的股票代號"""
+        tree = await self._request(url, return_type="html")
+        stock_ids: list[str] = []
+        if tree is None:
+            return stock_ids
+        for td in _CATEGORY_STOCK_CELLS(tree):
+            stock_id = td.text_content()[:4]
+            if not stock_id.isdigit():
+                continue
+            stock_ids.append(stock_id)
+        return stock_ids
 
     @cached(TTLCache(ttl=60 * 60 * 24, maxsize=1))
     async def fetch_stock_cat_map(self) -> dict[str, list[str]]:
@@ -265,31 +471,25 @@ class StockCrawl:
         回傳:
             dict[str, list[str]]: 股票分類對應表, key 為股票代號, value 為股票分類
         """
-        data = await self._request(MONEYDJ_STOCK_CATEGORY, return_type="text")
-        soup = BeautifulSoup(data, "lxml")
-        tables = soup.find_all("table")
-        trs = tables[0].find_all("tr")
-        tds = trs[0].find_all("td", {"width": "25%"})
+        result: defaultdict[str, list[str]] = defaultdict(list)
+        tree = await self._request(MONEYDJ_STOCK_CATEGORY, return_type="html")
+        if tree is None:
+            return result
+
+        tds = _CATEGORY_LINK_CELLS(tree)
         cat_url_map = {
-            td.text: f"https://www.moneydj.com{td.a['href']}"
+            td.text_content(): f"https://www.moneydj.com{_first_href(td)}"
             for td in tds
-            if td.text != "\xa0"
+            if td.text_content() != "\xa0"
         }
 
-        result: defaultdict[str, list[str]] = defaultdict(list)
-        for cat, url in cat_url_map.items():
-            async with self.session.get(url, headers={"User-Agent": ua.random}) as resp:
-                data = await resp.text(errors="replace")
-            soup = BeautifulSoup(data, "lxml")
-            tables = soup.find_all("table")
-            trs = tables[1].find_all("tr")
-            for tr in trs:
-                tds = tr.find_all("td")
-                if len(tds) != 10:
-                    continue
-                stock_id = tds[0].text[:4]
-                if not stock_id.isdigit():
-                    continue
+        # 各類股頁面互不相依, 同時請求並在各自回應後解析 (連線數由 limit_per_host 限制)
+        stock_id_lists = await asyncio.gather(
+            *(self._fetch_cat_stock_ids(url) for url in cat_url_map.values())
+        )
+
+        for cat, stock_ids in zip(cat_url_map, stock_id_lists, strict=True):
+            for stock_id in stock_ids:
                 result[stock_id].append(cat)
 
         return result
@@ -302,8 +502,9 @@ class StockCrawl:
         回傳:
             list[PunishStock]: 處置股票
         """
-        twse_data = await self._request(TWSE_PUNISH)
-        tpex_data = await self._request(TPEX_PUNISH)
+        twse_data, tpex_data = await asyncio.gather(
+            self._request(TWSE_PUNISH), self._request(TPEX_PUNISH)
+        )
         twse_punish_stocks = [
             PunishStock(
                 name=d["Name"],
@@ -331,17 +532,11 @@ class StockCrawl:
         """
         result: list[News] = []
 
-        data = await self._request(MOPS_NEWS, return_type="text")
-        soup = BeautifulSoup(data, "lxml")
-        table = soup.find(
-            "table", {"class": "hasBorder", "align": "center", "border": "1"}
-        )
-        if not isinstance(table, Tag):
+        tree = await self._request(MOPS_NEWS, return_type="html")
+        if tree is None:
             return result
-        for row in table.find_all("tr")[1:]:
-            cells = [cell.text.strip() for cell in row.find_all("td")]
-            if len(cells) != 6:
-                continue
+        for row in _NEWS_ROWS(tree):
+            cells = [cell.text_content().strip() for cell in row.findall("td")]
             result.append(News.parse_from_cells(cells))
 
         return result
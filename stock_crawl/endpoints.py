@@ -10,6 +10,8 @@ TPEX_COMPANY_INFO = "https://www.tpex.org.tw/openapi/v1/mopsfin_t187ap03_O"
 TPEX_DIVIDEND = "https://www.tpex.org.tw/openapi/v1/tpex_exright_prepost"
 # 上櫃處置有價證券資訊
 TPEX_PUNISH = "https://www.tpex.org.tw/openapi/v1/tpex_disposal_information"
+# 富邦證券網站, 用於組合主力進出明細中的相對連結
+FUBON_BASE_URL = "https://fubon-ebrokerdj.fbs.com.tw"
 # 富邦證券主力進出明細
 FUBON_MAIN_FORCE = "https://fubon-ebrokerdj.fbs.com.tw/z/zc/zco/zco_{id}_{day}.djhtm"
 # 富邦證券主力進出明細
@@ -1,12 +1,15 @@
 import datetime
 
-from bs4 import Tag
 from pydantic import BaseModel, field_validator
 
-from .utils import roc_to_western_date, str_to_float
+from .endpoints import FUBON_BASE_URL
+from .utils import roc_to_western_date, str_to_float, ymd_to_date
 
 __all__ = ("Stock", "HistoryTrade", "News", "PunishStock", "BuySell", "MainForce")
 
+# 一次移除數字欄位中的千分位逗號與百分比符號
+_STRIP_NUM = str.maketrans("", "", ",%")
+
 
 class MainForce(BaseModel):
     """
@@ -38,15 +41,16 @@ class MainForce(BaseModel):
     """是否為買超主力, False 則為賣超主力"""
 
     @classmethod
-    def parse(cls, cells: list[Tag], is_buy_force: bool) -> "MainForce":
-        """解析 HTML 的 <td> 標籤"""
-        return cls(
-            name=cells[0].text,
-            buy=int(cells[1].text.replace(",", "")),
-            sell=int(cells[2].text.replace(",", "")),
-            overbought=int(cells[3].text.replace(",", "")),
-            proportion=str_to_float(cells[4].text.replace("%", "")),
-            url=f"https://fubon-ebrokerdj.fbs.com.tw{cells[0].a['href']}",  # type: ignore
+    def parse(cls, cells: list[str], href: str, is_buy_force: bool) -> "MainForce":
+        """解析 HTML 的 <td> 標籤文字, href 為卷商名稱欄位中的連結"""
+        # 欄位已轉換成正確型別, 以 model_construct 略過驗證
+        return cls.model_construct(
+            name=cells[0],
+            buy=int(cells[1].translate(_STRIP_NUM)),
+            sell=int(cells[2].translate(_STRIP_NUM)),
+            overbought=int(cells[3].translate(_STRIP_NUM)),
+            proportion=str_to_float(cells[4].translate(_STRIP_NUM)),
+            url=FUBON_BASE_URL + href,
             is_buy_force=is_buy_force,
         )
 
@@ -75,14 +79,14 @@ class BuySell(BaseModel):
     """買賣超(張)"""
 
     @classmethod
-    def parse(cls, cells: list[Tag]) -> "BuySell":
-        """解析 HTML 的 <td> 標籤"""
-        return cls(
-            date=datetime.datetime.strptime(cells[0].text, "%Y/%m/%d").date(),
-            buy=int(cells[1].text.replace(",", "")),
-            sell=int(cells[2].text.replace(",", "")),
-            total=int(cells[3].text.replace(",", "")),
-            overbought=int(cells[4].text.replace(",", "")),
+    def parse(cls, cells: list[str]) -> "BuySell":
+        """解析 HTML 的 <td> 標籤文字"""
+        return cls.model_construct(
+            date=ymd_to_date(cells[0], "/"),
+            buy=int(cells[1].translate(_STRIP_NUM)),
+            sell=int(cells[2].translate(_STRIP_NUM)),
+            total=int(cells[3].translate(_STRIP_NUM)),
+            overbought=int(cells[4].translate(_STRIP_NUM)),
         )
 
 
@@ -168,7 +172,7 @@ class HistoryTrade(BaseModel):
 
     @field_validator("date", mode="before")
     def _convert_date(cls, v: str) -> datetime.date:
-        return datetime.datetime.strptime(v, "%Y-%m-%d").date()
+        return datetime.date.fromisoformat(v)
 
 
 class Stock(BaseModel):
@@ -1,6 +1,11 @@
 import datetime
+import functools
 
+# 台灣時區 (UTC+8)
+_TZ_UTC8 = datetime.timezone(datetime.timedelta(hours=8))
 
+
+@functools.lru_cache(maxsize=4096)
 def roc_to_western_date(roc_date_str: str) -> datetime.date:
     """將民國年轉換成西元年"""
     # format: 1100101
@@ -10,7 +15,20 @@ def roc_to_western_date(roc_date_str: str) -> datetime.date:
     return datetime.date(int(year) + 1911, int(month), int(day))
 
 
+def ymd_to_date(date_str: str, sep: str) -> datetime.date:
+    """將以 sep 分隔的西元年月日字串轉換成日期"""
+    # format: 2021/01/01 or 2021-01-01
+    year, month, day = date_str.split(sep)
+    return datetime.date(int(year), int(month), int(day))
+
+
 def str_to_float(s: str) -> float:
+    s = s.strip()
+    # 空字串或 "--" 等明顯不是數字的欄位直接回傳 0.0, 不必經過例外處理
+    if not s or not (s[0].isdigit() or s[0] in "+-."):
+        return 0.0
+    if not (s[-1].isdigit() or s[-1] == "."):
+        return 0.0
     try:
         return float(s)
     except ValueError:
@@ -18,7 +36,7 @@ def str_to_float(s: str) -> float:
 
 
 def get_now() -> datetime.datetime:
-    return datetime.datetime.now(tz=datetime.timezone(datetime.timedelta(hours=8)))
+    return datetime.datetime.now(tz=_TZ_UTC8)
 
 
 def get_today() -> datetime.date:
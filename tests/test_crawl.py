@@ -22,6 +22,15 @@ async def test_fetch_main_forces():
             assert len(main_forces) > 0, recent_day
 
 
+@pytest.mark.asyncio
+async def test_fetch_main_forces_datetime():
+    async with stock_crawl.StockCrawl() as client:
+        main_forces = await client.fetch_main_forces(
+            "2330", datetime.datetime(2023, 10, 4, 9, 30)
+        )
+        assert len(main_forces) > 0
+
+
 @pytest.mark.asyncio
 async def test_fetch_force_buy_sells():
     async with stock_crawl.StockCrawl() as client:
@@ -48,6 +57,21 @@ async def test_fetch_history_trades():
         assert len(history_trades) == 10
 
 
+@pytest.mark.asyncio
+async def test_fetch_many():
+    async with stock_crawl.StockCrawl() as client:
+        ids = ["2330", "2317"]
+        history_trades = await client.fetch_history_trades_many(ids, limit=10)
+        assert list(history_trades) == ids
+        assert all(len(trades) == 10 for trades in history_trades.values())
+
+        main_forces = await client.fetch_main_forces_many(
+            ids, datetime.date(2023, 10, 4)
+        )
+        assert list(main_forces) == ids
+        assert all(len(forces) > 0 for forces in main_forces.values())
+
+
 @pytest.mark.asyncio
 async def test_fetch_dividend_days():
     async with stock_crawl.StockCrawl() as client: